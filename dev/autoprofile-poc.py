@@ -1,3 +1,4 @@
+import os
 import ubelt as ub
 
 # try:
@@ -28,20 +29,23 @@ def create_poc(dry_run=False):
     modpaths['foo.baz.spam'] = (root / 'repo/foo/baz/spam.py')
     modpaths['foo.baz.eggs'] = (root / 'repo/foo/baz/eggs.py')
 
+    # Directories are created first (parents before children), then every
+    # file is written exactly once.
+    dpaths = [repo, modpaths['foo'], modpaths['foo.baz']]
+    file_texts = [
+        (modpaths['foo.__init__'], ''),
+        (modpaths['foo.bar'], 'def asdf():\n    2**(1/65536)'),
+        (modpaths['foo.baz.__init__'], ''),
+        (modpaths['foo.baz.spam'], 'def spamfunc():\n    ...'),
+        (modpaths['foo.baz.eggs'], 'def eggfunc():\n    ...'),
+    ]
+
     if not dry_run:
-        root.delete().ensuredir()
-        repo.ensuredir()
-        modpaths['script'].touch()
-        modpaths['foo'].ensuredir()
-        modpaths['foo.__init__'].touch()
-        modpaths['foo.bar'].touch()
-        modpaths['foo.bar'].write_text('def asdf():\n    2**(1/65536)')
-        modpaths['foo.baz'].ensuredir()
-        modpaths['foo.baz.__init__'].touch()
-        modpaths['foo.baz.spam'].touch()
-        modpaths['foo.baz.spam'].write_text('def spamfunc():\n    ...')
-        modpaths['foo.baz.eggs'].touch()
-        modpaths['foo.baz.eggs'].write_text('def eggfunc():\n    ...')
+        root.delete()
+        for dpath in dpaths:
+            os.makedirs(dpath, exist_ok=True)
+        for fpath, text in file_texts:
+            fpath.write_text(text)
 
         """different import variations to handle"""
         script_text = ub.codeblock(
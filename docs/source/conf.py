@@ -21,6 +21,8 @@ Notes:
 
     # Note: the module should importable before running this
     # (e.g. install it in developer mode or munge the PYTHONPATH)
+    # The extensions used here are parallel safe, so the Makefile builds
+    # with ``-j auto`` by default (override with e.g. SPHINXOPTS=-j1)
     make html
 
     git add source/auto/*.rst
@@ -110,40 +112,45 @@ Notes:
 
 
 # -- Project information -----------------------------------------------------
-import sphinx_rtd_theme
+import re
+import pathlib
 from os.path import exists
-from os.path import dirname
-from os.path import join
 
 
 def parse_version(fpath):
     """
     Statically parse the version number from a python file
     """
-    import ast
     if not exists(fpath):
         raise ValueError('fpath={!r} does not exist'.format(fpath))
-    with open(fpath, 'r') as file_:
+    with open(fpath, 'rb') as file_:
         sourcecode = file_.read()
-    pt = ast.parse(sourcecode)
-    class VersionVisitor(ast.NodeVisitor):
-        def visit_Assign(self, node):
+    # Fast path: a plain top-level ``__version__ = '<version>'`` assignment
+    # only needs a single regex pass instead of building the whole AST.
+    match = re.search(rb'^__version__\s*=\s*[\'"]([^\'"]+)[\'"]',
+                      sourcecode, re.M)
+    if match:
+        return match.group(1).decode('utf8')
+    import ast
+    pt = ast.parse(sourcecode, filename=fpath)
+    # Only top-level assignments can define the module version
+    for node in pt.body:
+        if isinstance(node, ast.Assign):
             for target in node.targets:
                 if getattr(target, 'id', None) == '__version__':
-                    self.version = node.value.s
-    visitor = VersionVisitor()
-    visitor.visit(pt)
-    return visitor.version
+                    return ast.literal_eval(node.value)
+    raise ValueError('fpath={!r} does not define __version__'.format(fpath))
 
 project = 'line_profiler'
 copyright = '2024, Robert Kern'
 author = 'Robert Kern'
 modname = 'line_profiler'
 
-repo_dpath = dirname(dirname(dirname(__file__)))
-mod_dpath = join(repo_dpath, 'line_profiler')
-src_dpath = dirname(mod_dpath)
-modpath = join(mod_dpath, '__init__.py')
+_repo_path = pathlib.Path(__file__).resolve().parents[2]
+repo_dpath = str(_repo_path)
+mod_dpath = str(_repo_path / 'line_profiler')
+src_dpath = repo_dpath
+modpath = str(_repo_path / 'line_profiler' / '__init__.py')
 release = parse_version(modpath)
 version = '.'.join(release.split('.')[0:2])
 
@@ -294,7 +301,6 @@ pygments_style = 'sphinx'
 # a list of builtin themes.
 #
 html_theme = 'sphinx_rtd_theme'
-html_theme_path = [sphinx_rtd_theme.get_html_theme_path()]
 
 # Theme options are theme-specific and customize the look and feel of a theme
 # further.  For a list of options available for each theme, see the
@@ -402,6 +408,12 @@ from sphinx.domains.python import PythonDomain  # NOQA
 # from sphinx.application import Sphinx  # NOQA
 from typing import Any, List  # NOQA
 
+# Patterns used when parsing processed docstrings
+_TAG_PAT = re.compile(r'^:(\w*):')
+_DIRECTIVE_PAT = re.compile(r'^\.\. (\w*)::\s*(\w*)')
+_WS_PAT = re.compile(r'\s\s*')
+_EXAMPLE_RUBRIC_SPLIT_PAT = re.compile(
+    '({}\\s*\n)'.format(re.escape('.. rubric:: Example')))
 
 # HACK TO PREVENT EXCESSIVE TIME.
 # TODO: FIXME FOR REAL
@@ -411,6 +423,12 @@ if MAX_TIME_MINUTES:
     TIMER = ubelt.Timer()
     TIMER.tic()
 
+# Render the figures of doctests marked with ``REQUIRES(--show)``
+RENDER_DOC_IMAGES = 0
+
+# Cache for :func:`_import_plot_modules`
+_PLOT_MODULES = {}
+
 
 class PatchedPythonDomain(PythonDomain):
     """
@@ -430,6 +448,20 @@ class PatchedPythonDomain(PythonDomain):
         return return_value
 
 
+def _dedent_lines(lines):
+    r"""
+    Equivalent to ``textwrap.dedent('\n'.join(lines)).split('\n')``, but
+    without building and re-splitting the joined text.
+    """
+    from os.path import commonprefix
+    if not lines:
+        return ['']
+    indents = [line[:len(line) - len(line.lstrip(' \t'))]
+               for line in lines if line.strip(' \t')]
+    n = len(commonprefix(indents)) if indents else 0
+    return [line[n:] if line.strip(' \t') else '' for line in lines]
+
+
 class GoogleStyleDocstringProcessor:
     """
     A small extension that runs after napoleon and reformats erotemic-flavored
@@ -439,6 +471,8 @@ class GoogleStyleDocstringProcessor:
     def __init__(self, autobuild=1):
         self.debug = 0
         self.registry = {}
+        # Maps each alias of a registered tag to that tag
+        self._alias_to_tag = {}
         if autobuild:
             self._register_builtins()
 
@@ -461,6 +495,11 @@ class GoogleStyleDocstringProcessor:
                 'alias': alias,
                 'func': func,
             }
+            self._alias_to_tag = {
+                a: regitem['tag']
+                for regitem in self.registry.values()
+                for a in regitem['alias']
+            }
             return func
         return _wrap
 
@@ -481,16 +520,13 @@ class GoogleStyleDocstringProcessor:
 
         @self.register_section(tag='SpecialExample', alias=['Benchmark', 'Sympy', 'Doctest'])
         def benchmark(lines):
-            import textwrap
             new_lines = []
             tag = lines[0].replace(':', '').strip()
             # new_lines.append(lines[0])  # TODO: it would be nice to change the tagline.
             # new_lines.append('')
             new_lines.append('.. rubric:: {}'.format(tag))
             new_lines.append('')
-            new_text = textwrap.dedent('\n'.join(lines[1:]))
-            redone = new_text.split('\n')
-            new_lines.extend(redone)
+            new_lines.extend(_dedent_lines(lines[1:]))
             # import ubelt as ub
             # print('new_lines = {}'.format(ub.urepr(new_lines, nl=1)))
             # new_lines.append('')
@@ -548,50 +584,45 @@ class GoogleStyleDocstringProcessor:
             >>> new_lines = self.process(lines[:])
             >>> print(chr(10).join(new_lines))
         """
-        orig_lines = lines[:]
-        new_lines = []
+        # Split the docstring into (tag, lines) sections in a single pass
         curr_mode = '__doc__'
         accum = []
-
-        def accept():
-            """ called when we finish reading a section """
-            if curr_mode == '__doc__':
-                # Keep the lines as-is
-                new_lines.extend(accum)
-            else:
-                # Process this section with the given function
-                regitem = self.registry[curr_mode]
-                func = regitem['func']
-                fixed = func(accum)
-                new_lines.extend(fixed)
-            # Reset the accumulator for the next section
-            accum[:] = []
-
-        for line in orig_lines:
+        sections = [(curr_mode, accum)]
+        alias_to_tag = self._alias_to_tag
+        for line in lines:
 
             found = None
-            for regitem in self.registry.values():
-                if line.startswith(regitem['alias']):
-                    found = regitem['tag']
-                    break
-            if not found and line and not line.startswith(' '):
-                # if the line startswith anything but a space, we are no longer
-                # in the previous nested scope. NOTE: This assumption may not
-                # be general, but it works for my code.
-                found = '__doc__'
-
-            if found:
-                # New section is found, accept the previous one and start
-                # accumulating the new one.
-                accept()
+            if line and not line.startswith(' '):
+                # A registered section starts with its tag (e.g.
+                # ``CommandLine:``). Otherwise, if the line startswith anything
+                # but a space, we are no longer in the previous nested scope.
+                # NOTE: This assumption may not be general, but it works for
+                # my code.
+                found = alias_to_tag.get(line.split(':', 1)[0], '__doc__')
+
+            if found and (found != '__doc__' or curr_mode != '__doc__'):
+                # New section is found, start accumulating it. Consecutive
+                # plain docstring lines stay in the same section.
                 curr_mode = found
+                accum = []
+                sections.append((curr_mode, accum))
 
             accum.append(line)
 
-        # Finialize the last section
-        accept()
+        # Without any registered section the lines are kept as-is, so there
+        # is nothing to rebuild.
+        if len(sections) > 1:
+            new_lines = []
+            for curr_mode, accum in sections:
+                if curr_mode == '__doc__':
+                    # Keep the lines as-is
+                    new_lines.extend(accum)
+                else:
+                    # Process this section with the given function
+                    func = self.registry[curr_mode]['func']
+                    new_lines.extend(func(accum))
+            lines[:] = new_lines
 
-        lines[:] = new_lines
         # make sure there is a blank line at the end
         if lines and lines[-1]:
             lines.append('')
@@ -645,14 +676,14 @@ class GoogleStyleDocstringProcessor:
         #     import xdev
         #     xdev.embed()
 
-        render_doc_images = 0
+        render_doc_images = RENDER_DOC_IMAGES
 
         if MAX_TIME_MINUTES and TIMER.toc() > (60 * MAX_TIME_MINUTES):
             render_doc_images = False  # FIXME too slow on RTD
 
         if render_doc_images:
             # DEVELOPING
-            if any('REQUIRES(--show)' in line for line in lines):
+            if 'REQUIRES(--show)' in '\n'.join(lines):
                 # import xdev
                 # xdev.embed()
                 create_doctest_figure(app, obj, name, lines)
@@ -726,16 +757,18 @@ class SphinxDocstring:
     def __init__(docstr, lines):
         docstr.lines = lines
 
-        # FORMAT THE RETURNS SECTION A BIT NICER
-        import re
-        tag_pat = re.compile(r'^:(\w*):')
-        directive_pat = re.compile(r'^.. (\w*)::\s*(\w*)')
+        # Both sphinx tags and directives contain a colon, so docstrings
+        # without one have nothing to split.
+        if ':' not in '\n'.join(lines):
+            docstr.sphinx_parts = []
+            return
 
+        # FORMAT THE RETURNS SECTION A BIT NICER
         # Split by sphinx types, mark the line offset where they start / stop
         sphinx_parts = []
         for idx, line in enumerate(lines):
-            tag_match = tag_pat.search(line)
-            directive_match = directive_pat.search(line)
+            tag_match = _TAG_PAT.search(line)
+            directive_match = _DIRECTIVE_PAT.search(line)
             if tag_match:
                 tag = tag_match.groups()[0]
                 sphinx_parts.append({
@@ -786,17 +819,91 @@ def paragraph(text):
     Returns:
         str: the reduced text block
     """
-    import re
-    out = re.sub(r'\s\s*', ' ', text).strip()
+    out = _WS_PAT.sub(' ', text).strip()
     return out
 
 
+def _import_plot_modules():
+    """
+    Import the modules needed to render doctest figures and select a
+    non-interactive matplotlib backend. This is only done once per build.
+
+    Returns:
+        dict: empty if the plotting dependencies are not available
+    """
+    if 'available' not in _PLOT_MODULES:
+        try:
+            import xdoctest
+            import kwplot
+        except ImportError:
+            _PLOT_MODULES['available'] = False
+        else:
+            kwplot.autompl(force='agg')
+            try:
+                import pytest  # NOQA
+            except ImportError:
+                pass
+            try:
+                from xdoctest.exceptions import Skipped
+            except ImportError:  # nocover
+                # Define dummy skipped exception if pytest is not available
+                class Skipped(Exception):
+                    pass
+            _PLOT_MODULES.update({
+                'available': True,
+                'xdoctest': xdoctest,
+                'kwplot': kwplot,
+                'plt': kwplot.autoplt(),
+                'Skipped': Skipped,
+            })
+    if not _PLOT_MODULES['available']:
+        return {}
+    return _PLOT_MODULES
+
+
+def _doctest_line_offsets(doctest):
+    """
+    Where the doctest starts and ends relative to the parsed text
+    """
+    start_line_offset = doctest.lineno - 1
+    last_part = doctest._parts[-1]
+    last_line_offset = start_line_offset + last_part.line_offset + last_part.n_lines - 1
+    offsets = {
+        'start': start_line_offset,
+        'end': last_line_offset,
+        'stop': last_line_offset + 1,
+    }
+    return offsets
+
+
+def _fast_copy(src, dst):
+    """
+    Hardlink ``src`` to ``dst`` when possible, otherwise copy it.
+    """
+    import os
+    import shutil
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except (OSError, NotImplementedError):
+        shutil.copy(src, dst)
+
+
 def create_doctest_figure(app, obj, name, lines):
     """
     The idea is that each doctest that produces a figure should generate that
     and then that figure should be part of the docs.
     """
-    import xdoctest
+    plot_modules = _import_plot_modules()
+    if not plot_modules:
+        return
+    xdoctest = plot_modules['xdoctest']
+    kwplot = plot_modules['kwplot']
+    plt = plot_modules['plt']
+    Skipped = plot_modules['Skipped']
     import sys
     import types
     if isinstance(obj, types.ModuleType):
@@ -826,35 +933,18 @@ def create_doctest_figure(app, obj, name, lines):
 
     fig_num = 1
 
-    import kwplot
-    kwplot.autompl(force='agg')
-    plt = kwplot.autoplt()
-
     docstr = '\n'.join(lines)
 
     # TODO: The freeform parser does not work correctly here.
     # We need to parse out the sphinx (epdoc)? individual examples
     # so we can get different figures. But we can hack it for now.
 
-    import re
-    split_parts = re.split('({}\\s*\n)'.format(re.escape('.. rubric:: Example')), docstr)
+    split_parts = _EXAMPLE_RUBRIC_SPLIT_PAT.split(docstr)
     # split_parts = docstr.split('.. rubric:: Example')
 
     # import xdev
     # xdev.embed()
 
-    def doctest_line_offsets(doctest):
-        # Where the doctests starts and ends relative to the file
-        start_line_offset = doctest.lineno - 1
-        last_part = doctest._parts[-1]
-        last_line_offset = start_line_offset + last_part.line_offset + last_part.n_lines - 1
-        offsets = {
-            'start': start_line_offset,
-            'end': last_line_offset,
-            'stop': last_line_offset + 1,
-        }
-        return offsets
-
     # from xdoctest import utils
     # part_lines = utils.add_line_numbers(docstr.split('\n'), n_digits=3, start=0)
     # print('\n'.join(part_lines))
@@ -863,6 +953,11 @@ def create_doctest_figure(app, obj, name, lines):
     curr_line_offset = 0
     for part in split_parts:
         num_lines = part.count('\n')
+        if '--show' not in part:
+            # Only the doctests that show figures are run, so the other
+            # examples do not need to be parsed.
+            curr_line_offset += num_lines
+            continue
 
         doctests = list(xdoctest.core.parse_docstr_examples(
             part, modpath=modpath, callname=name,
@@ -874,50 +969,37 @@ def create_doctest_figure(app, obj, name, lines):
         #     docstr, modpath=modpath, callname=name))
 
         for doctest in doctests:
-            if '--show' in part:
+            # print('-- SHOW TEST---')/)
+            # kwplot.close_figures()
+            try:
+                doctest.mode = 'native'
+                doctest.run(verbose=0, on_error='raise')
                 ...
-                # print('-- SHOW TEST---')/)
-                # kwplot.close_figures()
-                try:
-                    import pytest  # NOQA
-                except ImportError:
-                    pass
-                try:
-                    from xdoctest.exceptions import Skipped
-                except ImportError:  # nocover
-                    # Define dummy skipped exception if pytest is not available
-                    class Skipped(Exception):
-                        pass
-                try:
-                    doctest.mode = 'native'
-                    doctest.run(verbose=0, on_error='raise')
-                    ...
-                except Skipped:
-                    print(f'Skip doctest={doctest}')
-                except Exception as ex:
-                    print(f'ex={ex}')
-                    print(f'Error in doctest={doctest}')
-
-                offsets = doctest_line_offsets(doctest)
-                doctest_line_end = curr_line_offset + offsets['stop']
-                insert_line_index = doctest_line_end
-
-                figures = kwplot.all_figures()
-                for fig in figures:
-                    fig_num += 1
-                    # path_name = path_sanatize(name)
-                    path_name = (name).replace('.', '_')
-                    fig_fpath = src_fig_dpath / f'fig_{path_name}_{fig_num:03d}.jpeg'
-                    fig.savefig(fig_fpath)
-                    print(f'Wrote figure: {fig_fpath}')
-                    to_insert_fpaths.append({
-                        'insert_line_index': insert_line_index,
-                        'fpath': fig_fpath,
-                    })
-
-                for fig in figures:
-                    plt.close(fig)
-                # kwplot.close_figures(figures)
+            except Skipped:
+                print(f'Skip doctest={doctest}')
+            except Exception as ex:
+                print(f'ex={ex}')
+                print(f'Error in doctest={doctest}')
+
+            offsets = _doctest_line_offsets(doctest)
+            doctest_line_end = curr_line_offset + offsets['stop']
+            insert_line_index = doctest_line_end
+
+            figures = kwplot.all_figures()
+            for fig in figures:
+                fig_num += 1
+                # path_name = path_sanatize(name)
+                path_name = (name).replace('.', '_')
+                fig_fpath = src_fig_dpath / f'fig_{path_name}_{fig_num:03d}.jpeg'
+                fig.savefig(fig_fpath)
+                print(f'Wrote figure: {fig_fpath}')
+                to_insert_fpaths.append({
+                    'insert_line_index': insert_line_index,
+                    'fpath': fig_fpath,
+                })
+
+            plt.close('all')
+            # kwplot.close_figures(figures)
 
         curr_line_offset += (num_lines)
 
@@ -931,7 +1013,6 @@ def create_doctest_figure(app, obj, name, lines):
 
     end_index = len(lines)
     # Reverse order for inserts
-    import shutil
     for info in to_insert_fpaths[::-1]:
         src_abs_fpath = info['fpath']
 
@@ -943,15 +1024,15 @@ def create_doctest_figure(app, obj, name, lines):
 
         dst_abs_fpath1 = doc_outdir / rel_to_root_fpath
         dst_abs_fpath1.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy(src_abs_fpath, dst_abs_fpath1)
+        _fast_copy(src_abs_fpath, dst_abs_fpath1)
 
         dst_abs_fpath2 = doc_outdir / rel_to_static_fpath
         dst_abs_fpath2.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy(src_abs_fpath, dst_abs_fpath2)
+        _fast_copy(src_abs_fpath, dst_abs_fpath2)
 
         dst_abs_fpath3 = doc_srcdir / rel_to_static_fpath
         dst_abs_fpath3.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy(src_abs_fpath, dst_abs_fpath3)
+        _fast_copy(src_abs_fpath, dst_abs_fpath3)
 
         if INSERT_AT == 'inline':
             # Try to insert after test
@@ -995,6 +1076,10 @@ def fix_rst_todo_section(lines):
     ...
 
 
+# Built once per process and shared by every build that runs setup()
+_DOCSTRING_PROCESSOR = GoogleStyleDocstringProcessor()
+
+
 def setup(app):
     import sphinx
     app : sphinx.application.Sphinx = app
@@ -1002,32 +1087,14 @@ def setup(app):
 
     app.connect("doctree-resolved", postprocess_hyperlinks)
 
-    docstring_processor = GoogleStyleDocstringProcessor()
     # https://stackoverflow.com/questions/26534184/can-sphinx-ignore-certain-tags-in-python-docstrings
-    app.connect('autodoc-process-docstring', docstring_processor.process_docstring_callback)
-
-    def copy(src, dst):
-        import shutil
-        print(f'Copy {src} -> {dst}')
-        assert src.exists()
-        if not dst.parent.exists():
-            dst.parent.mkdir()
-        shutil.copy(src, dst)
-
-    ### Hack for kwcoco: TODO: figure out a way for the user to configure this.
-    HACK_FOR_KWCOCO = 0
-    if HACK_FOR_KWCOCO:
-        import pathlib
-        doc_outdir = pathlib.Path(app.outdir) / 'auto'
-        doc_srcdir = pathlib.Path(app.srcdir) / 'auto'
-
-        mod_dpath = doc_srcdir / '../../../kwcoco'
-
-        src_fpath = (mod_dpath / 'coco_schema.json')
-        copy(src_fpath, doc_outdir / src_fpath.name)
-        copy(src_fpath, doc_srcdir / src_fpath.name)
-
-        src_fpath = (mod_dpath / 'coco_schema_informal.rst')
-        copy(src_fpath, doc_outdir / src_fpath.name)
-        copy(src_fpath, doc_srcdir / src_fpath.name)
-    return app
+    app.connect('autodoc-process-docstring', _DOCSTRING_PROCESSOR.process_docstring_callback)
+
+    # The hooks registered above only mutate the objects they are given, so
+    # they are safe for parallel (``-j``) reads and writes. Sphinx does not
+    # count conf.py as an extension when deciding whether to parallelize, but
+    # declare it anyway in case these hooks move into a proper extension.
+    return {
+        'parallel_read_safe': True,
+        'parallel_write_safe': True,
+    }
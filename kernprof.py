@@ -84,8 +84,6 @@ import functools
 import os
 import sys
 import threading
-import asyncio  # NOQA
-import concurrent.futures  # NOQA
 import time
 from argparse import ArgumentError, ArgumentParser
 
@@ -133,17 +131,19 @@ class ContextualProfile(Profile):
     def enable_by_count(self, subcalls=True, builtins=True):
         """ Enable the profiler if it hasn't been enabled before.
         """
-        if self.enable_count == 0:
+        count = self.enable_count
+        if not count:
             self.enable(subcalls=subcalls, builtins=builtins)
-        self.enable_count += 1
+        self.enable_count = count + 1
 
     def disable_by_count(self):
         """ Disable the profiler if the number of disable requests matches the
         number of enable requests.
         """
-        if self.enable_count > 0:
-            self.enable_count -= 1
-            if self.enable_count == 0:
+        count = self.enable_count
+        if count > 0:
+            self.enable_count = count - 1
+            if count == 1:
                 self.disable()
 
     def __call__(self, func):
@@ -217,29 +217,63 @@ class RepeatedTimer(object):
         .. [SO474528] https://stackoverflow.com/questions/474528/execute-function-every-x-seconds/40965385#40965385
     """
     def __init__(self, interval, dump_func, outfile):
-        self._timer = None
+        self._thread = None
+        self._stop_event = None
         self.interval = interval
         self.dump_func = dump_func
         self.outfile = outfile
         self.is_running = False
-        self.next_call = time.time()
+        # Deadlines use the monotonic clock, so wall-clock adjustments do not
+        # shift or bunch up the dumps
+        self.next_call = time.monotonic()
         self.start()
 
-    def _run(self):
-        self.is_running = False
-        self.start()
-        self.dump_func(self.outfile)
+    def _run(self, stop_event):
+        # A single thread waits out each interval, instead of spawning a new
+        # ``threading.Timer`` per dump
+        while True:
+            self.next_call += self.interval
+            delay = max(0, self.next_call - time.monotonic())
+            if stop_event.wait(delay):
+                break
+            # A failed dump (e.g. the outfile is locked by a viewer) must not
+            # end the thread, or every later dump would silently stop
+            try:
+                self.dump_func(self.outfile)
+            except Exception as ex:
+                sys.stderr.write('Failed to write profile results to %s: %r\n'
+                                 % (self.outfile, ex))
 
     def start(self):
         if not self.is_running:
-            self.next_call += self.interval
-            self._timer = threading.Timer(self.next_call - time.time(), self._run)
-            self._timer.start()
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._stop_event,), daemon=True)
+            self._thread.start()
             self.is_running = True
 
     def stop(self):
-        self._timer.cancel()
+        self._stop_event.set()
         self.is_running = False
+        # Wait for a dump in progress, so it cannot clobber a later final dump
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+def _dump_stats_atomic(prof, outfile):
+    """ Dump the stats to a temporary file and move it over ``outfile``, so
+    readers never see a partially written file.
+    """
+    tmp_outfile = outfile + '.tmp'
+    try:
+        prof.dump_stats(tmp_outfile)
+        os.replace(tmp_outfile, outfile)
+    except BaseException:
+        try:
+            os.remove(tmp_outfile)
+        except OSError:
+            pass
+        raise
 
 
 def find_script(script_name):
@@ -261,22 +295,30 @@ def find_script(script_name):
     raise SystemExit(1)
 
 
+def _prepend_sys_path(dpath):
+    """ Put a directory at the front of :py:data:`sys.path`, unless it is
+    already there (e.g. when the setup file and the script share a directory).
+    """
+    if not sys.path or sys.path[0] != dpath:
+        sys.path.insert(0, dpath)
+
+
 def _python_command():
     """
     Return a command that corresponds to :py:obj:`sys.executable`.
     """
     import shutil
-    if shutil.which('python') == sys.executable:
-        return 'python'
-    elif shutil.which('python3') == sys.executable:
-        return 'python3'
-    else:
-        return sys.executable
+    for abbr in ('python', 'python3'):
+        if shutil.which(abbr) == sys.executable:
+            return abbr
+    return sys.executable
 
 
-def main(args=None):
+@functools.lru_cache(maxsize=None)
+def _build_parser():
     """
-    Runs the command line interface
+    Build the command line parser. This is cached, so repeated calls to
+    :func:`main` reuse the same parser.
     """
     def positive_float(value):
         val = float(value)
@@ -319,8 +361,20 @@ def main(args=None):
 
     parser.add_argument('script', help='The python script file to run')
     parser.add_argument('args', nargs='...', help='Optional script arguments')
+    return parser
 
-    options = parser.parse_args(args)
+
+def main(args=None):
+    """
+    Runs the command line interface
+    """
+    options = _build_parser().parse_args(args)
+
+    # Import these before the profiled code runs, so their import and
+    # registration side effects happen up front, but only once we know a
+    # script will actually be run (not for ``--help`` or ``--version``).
+    import asyncio  # NOQA
+    import concurrent.futures  # NOQA
 
     if not options.outfile:
         extension = 'lprof' if options.line_by_line else 'prof'
@@ -335,23 +389,26 @@ def main(args=None):
         __name__ = '__main__'
         # Make sure the script's directory is on sys.path instead of just
         # kernprof.py's.
-        sys.path.insert(0, os.path.dirname(setup_file))
+        _prepend_sys_path(os.path.dirname(setup_file))
         ns = locals()
         execfile(setup_file, ns, ns)
 
-    if options.line_by_line:
+    # line_profiler is only required for line-by-line profiling
+    try:
         import line_profiler
+    except ImportError:
+        if options.line_by_line:
+            raise
+        line_profiler = None
+
+    if options.line_by_line:
         prof = line_profiler.LineProfiler()
         options.builtin = True
     else:
         prof = ContextualProfile()
 
     # If line_profiler is installed, then overwrite the explicit decorator
-    try:
-        import line_profiler
-    except ImportError:
-        ...
-    else:
+    if line_profiler is not None:
         line_profiler.profile._kernprof_overwrite(prof)
 
     if options.builtin:
@@ -362,16 +419,15 @@ def main(args=None):
     __name__ = '__main__'
     # Make sure the script's directory is on sys.path instead of just
     # kernprof.py's.
-    sys.path.insert(0, os.path.dirname(script_file))
+    _prepend_sys_path(os.path.dirname(script_file))
 
-    if options.output_interval:
-        rt = RepeatedTimer(max(options.output_interval, 1), prof.dump_stats, options.outfile)
     original_stdout = sys.stdout
     if options.output_interval:
-        rt = RepeatedTimer(max(options.output_interval, 1), prof.dump_stats, options.outfile)
+        rt = RepeatedTimer(max(options.output_interval, 1),
+                           functools.partial(_dump_stats_atomic, prof),
+                           options.outfile)
     try:
         try:
-            execfile_ = execfile
             ns = locals()
             if options.prof_mod and options.line_by_line:
                 from line_profiler.autoprofile import autoprofile
@@ -380,13 +436,13 @@ def main(args=None):
             elif options.builtin:
                 execfile(script_file, ns, ns)
             else:
-                prof.runctx('execfile_(%r, globals())' % (script_file,), ns, ns)
+                prof.runcall(execfile, script_file, ns, ns)
         except (KeyboardInterrupt, SystemExit):
             pass
     finally:
         if options.output_interval:
             rt.stop()
-        prof.dump_stats(options.outfile)
+        _dump_stats_atomic(prof, options.outfile)
         print('Wrote profile results to %s' % options.outfile)
         if options.view:
             if isinstance(prof, ContextualProfile):
@@ -1,6 +1,10 @@
 # cython: language_level=3
 # cython: infer_types=True
 # cython: legacy_implicit_noexcept=True
+# cython: boundscheck=False
+# cython: wraparound=False
+# cython: cdivision=True
+# cython: initializedcheck=False
 # distutils: language=c++
 # distutils: include_dirs = python25.pxd
 r"""
@@ -101,8 +105,8 @@ cdef extern from "Python.h":
     
 
 cdef extern from "timers.c":
-    PY_LONG_LONG hpTimer()
-    double hpTimerUnit()
+    PY_LONG_LONG hpTimer() nogil
+    double hpTimerUnit() nogil
 
 cdef extern from "unset_trace.c":
     void unset_trace()
@@ -117,7 +121,7 @@ cdef struct LastTime:
     int f_lineno
     PY_LONG_LONG time
 
-cdef inline int64 compute_line_hash(uint64 block_hash, uint64 linenum):
+cdef inline int64 compute_line_hash(uint64 block_hash, uint64 linenum) noexcept nogil:
     """
     Compute the hash used to store each line timing in an unordered_map.
     This is fairly simple, and could use some improvement since linenum
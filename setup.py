@@ -34,6 +34,96 @@ def _choose_build_method():
     return LINE_PROFILER_BUILD_METHOD
 
 
+def _num_build_jobs():
+    """
+    Number of parallel jobs used to compile the C-extension sources.
+
+    Defaults to the number of CPUs and can be limited with the ``MAX_JOBS``
+    environment variable.
+    """
+    num_jobs = os.cpu_count() or 1
+    MAX_JOBS = os.environ.get("MAX_JOBS", "")
+    if MAX_JOBS:
+        num_jobs = min(num_jobs, max(int(MAX_JOBS), 1))
+    return num_jobs
+
+
+def _extension_build_args():
+    """
+    Extra compiler and linker flags for the C-extension.
+
+    The trace callback runs on every line event, so we ask for aggressive
+    optimization. Tuning for the host CPU (``-march=native``) produces
+    binaries that are not portable, so it is only enabled when
+    ``LINE_PROFILER_NATIVE_ARCH`` is set (e.g. for local source builds). Debug
+    builds (``DEV=true``) use the compiler defaults.
+
+    Returns:
+        Tuple[List[str], List[str]]: extra_compile_args, extra_link_args
+    """
+    if os.environ.get("DEV", "").lower() == "true":
+        return [], []
+    NATIVE_ARCH = os.environ.get("LINE_PROFILER_NATIVE_ARCH", "").lower()
+    native = NATIVE_ARCH in {"true", "on", "yes", "1"}
+    if sys.platform == "win32":
+        compile_args = ["/O2", "/Ob3"]
+        if native:
+            compile_args.append("/arch:AVX2")
+        return compile_args, []
+    compile_args = ["-O3", "-fvisibility=hidden", "-funroll-loops"]
+    link_args = []
+    if native:
+        compile_args.extend(["-march=native", "-mtune=native"])
+    if sys.platform.startswith("linux"):
+        compile_args.append("-fno-plt")
+        link_args.extend(["-Wl,-O1", "-Wl,--as-needed"])
+    return compile_args, link_args
+
+
+_CYTHONIZE_STAMP_FPATH = os.path.join("build", ".cythonize-stamp")
+
+
+def _cythonize_stamp_key(fpaths, *extra):
+    """
+    Hash of the content of the Cython inputs, the Cython version and any extra
+    build configuration.
+    """
+    import hashlib
+    import Cython
+    hasher = hashlib.sha256(Cython.__version__.encode())
+    for fpath in fpaths:
+        with open(fpath, "rb") as file_:
+            hasher.update(file_.read())
+    for item in extra:
+        hasher.update(repr(getattr(item, "__dict__", item)).encode())
+    return hasher.hexdigest()
+
+
+def _reuse_unchanged_cython_output(stamp_key, generated_fpath):
+    """
+    Touching the sources (e.g. on checkout) makes ``cythonize`` regenerate its
+    output even when nothing changed. If the stamp written by the last build
+    says ``generated_fpath`` was produced from identical inputs and has not
+    been modified since, mark it as newer than the sources so that
+    ``cythonize(force=False)`` reuses it.
+    """
+    try:
+        with open(_CYTHONIZE_STAMP_FPATH, "r") as file_:
+            prev_key, prev_mtime = file_.read().split()
+        curr_mtime = os.stat(generated_fpath).st_mtime_ns
+    except (OSError, ValueError):
+        return
+    if prev_key == stamp_key and prev_mtime == str(curr_mtime):
+        os.utime(generated_fpath)
+
+
+def _write_cythonize_stamp(stamp_key, generated_fpath):
+    os.makedirs(os.path.dirname(_CYTHONIZE_STAMP_FPATH), exist_ok=True)
+    with open(_CYTHONIZE_STAMP_FPATH, "w") as file_:
+        file_.write("{} {}\n".format(
+            stamp_key, os.stat(generated_fpath).st_mtime_ns))
+
+
 def parse_version(fpath):
     """
     Statically parse the version number from a python file
@@ -218,28 +308,89 @@ if __name__ == '__main__':
         # was already attempted in _choose_build_method
         import multiprocessing
         from setuptools import Extension
+        from setuptools.command.build_ext import build_ext
         from Cython.Build import cythonize
 
+        class ParallelBuildExt(build_ext):
+            """
+            Compiles the sources of each extension in parallel.
+
+            The stock ``--parallel`` option only distributes whole extensions
+            over the workers, but all of our C/C++ sources belong to a single
+            extension, so we also fan out the per-source compiler calls.
+            """
+            def finalize_options(self):
+                super().finalize_options()
+                if self.parallel is None:
+                    self.parallel = _num_build_jobs()
+
+            def build_extension(self, ext):
+                num_jobs = self.parallel or 1
+                if num_jobs <= 1 or len(ext.sources) <= 1:
+                    return super().build_extension(ext)
+                from concurrent.futures import ThreadPoolExecutor
+                compiler = self.compiler
+                # MSVC initializes itself lazily on the first compile call;
+                # do it up front so the worker threads do not race on it.
+                if not getattr(compiler, "initialized", True):
+                    compiler.initialize()
+                serial_compile = compiler.compile
+
+                def parallel_compile(sources, *args, **kwargs):
+                    def compile_one(source):
+                        return serial_compile([source], *args, **kwargs)
+                    with ThreadPoolExecutor(num_jobs) as executor:
+                        results = list(executor.map(compile_one, sources))
+                    return [obj for objects in results for obj in objects]
+
+                compiler.compile = parallel_compile
+                try:
+                    return super().build_extension(ext)
+                finally:
+                    del compiler.compile
+
         def run_cythonize(force=False):
-            return cythonize(
-                Extension(
-                    name="line_profiler._line_profiler",
-                    sources=["line_profiler/_line_profiler.pyx", "line_profiler/timers.c", "line_profiler/unset_trace.c"],
-                    language="c++",
-                    define_macros=[("CYTHON_TRACE", (1 if os.getenv("DEV") == "true" else 0))],
-                ),
-                compiler_directives={
-                    "language_level": 3,
-                    "infer_types": True,
-                    "legacy_implicit_noexcept": True,
-                    "linetrace": (True if os.getenv("DEV") == "true" else False)
-                },
+            extra_compile_args, extra_link_args = _extension_build_args()
+            extension = Extension(
+                name="line_profiler._line_profiler",
+                sources=["line_profiler/_line_profiler.pyx", "line_profiler/timers.c", "line_profiler/unset_trace.c"],
+                language="c++",
+                define_macros=[("CYTHON_TRACE", (1 if os.getenv("DEV") == "true" else 0))],
+                extra_compile_args=extra_compile_args,
+                extra_link_args=extra_link_args,
+            )
+            compiler_directives = {
+                "language_level": 3,
+                "infer_types": True,
+                "legacy_implicit_noexcept": True,
+                "boundscheck": False,
+                "wraparound": False,
+                "cdivision": True,
+                "initializedcheck": False,
+                "nonecheck": False,
+                "overflowcheck": False,
+                "linetrace": (True if os.getenv("DEV") == "true" else False)
+            }
+            stamp_key = _cythonize_stamp_key(
+                extension.sources + ["line_profiler/python25.pxd",
+                                     "line_profiler/timers.h",
+                                     "line_profiler/unset_trace.h"],
+                extension, compiler_directives)
+            generated_fpath = "line_profiler/_line_profiler.cpp"
+            if not force:
+                _reuse_unchanged_cython_output(stamp_key, generated_fpath)
+            ext_modules = cythonize(
+                extension,
+                compiler_directives=compiler_directives,
                 include_path=["line_profiler/python25.pxd"],
                 force=force,
                 nthreads=multiprocessing.cpu_count(),
             )
+            _write_cythonize_stamp(stamp_key, generated_fpath)
+            return ext_modules
 
         setupkw.update(dict(ext_modules=run_cythonize()))
+        setupkw["cmdclass"] = {"build_ext": ParallelBuildExt}
         setup = setuptools.setup
     else:
         raise Exception('Unknown build method')
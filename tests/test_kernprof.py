@@ -1,5 +1,11 @@
+import os
+import sys
+import tempfile
+import time
 import unittest
-from kernprof import ContextualProfile
+from unittest import mock
+from kernprof import (ContextualProfile, RepeatedTimer, execfile, find_script,
+                      _dump_stats_atomic, _prepend_sys_path)
 
 
 def f(x):
@@ -73,6 +79,124 @@ class TestKernprof(unittest.TestCase):
             next(i)
         self.assertEqual(profile.enable_count, 0)
 
+    def test_execfile_runs_current_source(self):
+        with tempfile.TemporaryDirectory() as dpath:
+            fpath = os.path.join(dpath, 'script.py')
+            orig_flag = sys.dont_write_bytecode
+            sys.dont_write_bytecode = False
+            try:
+                # Rewrites within the same second must not run stale code
+                for x in [1, 2]:
+                    with open(fpath, 'w') as file:
+                        file.write('result = {}\n'.format(x))
+                    ns = {}
+                    execfile(fpath, ns, ns)
+                    self.assertEqual(ns['result'], x)
+            finally:
+                sys.dont_write_bytecode = orig_flag
+            self.assertEqual(os.listdir(dpath), ['script.py'])
+
+    def test_find_script(self):
+        with tempfile.TemporaryDirectory() as dpath:
+            # Scripts on the PATH are found even if they are not executable
+            fpath = os.path.join(dpath, 'not_executable_script.py')
+            with open(fpath, 'w') as file:
+                file.write('\n')
+            orig_path = os.environ.get('PATH')
+            os.environ['PATH'] = os.pathsep.join([dpath, orig_path or ''])
+            try:
+                found = find_script('not_executable_script.py')
+                with self.assertRaises(SystemExit):
+                    find_script('does_not_exist_script.py')
+            finally:
+                if orig_path is None:
+                    del os.environ['PATH']
+                else:
+                    os.environ['PATH'] = orig_path
+            self.assertTrue(os.path.samefile(found, fpath))
+            self.assertEqual(find_script(fpath), fpath)
+
+    def test_dump_stats_atomic(self):
+        import pstats
+        profile = ContextualProfile()
+        with profile:
+            f(1)
+        with tempfile.TemporaryDirectory() as dpath:
+            outfile = os.path.join(dpath, 'out.prof')
+            _dump_stats_atomic(profile, outfile)
+            _dump_stats_atomic(profile, outfile)
+            self.assertEqual(os.listdir(dpath), ['out.prof'])
+            stats = pstats.Stats(outfile)
+            self.assertIn('f', {key[2] for key in stats.stats})
+
+            # A failed dump keeps the previous results and leaves no tempfile
+            def partial_dump(filename):
+                with open(filename, 'wb') as file:
+                    file.write(b'partial')
+                raise RuntimeError('dump failed')
+
+            with mock.patch.object(profile, 'dump_stats',
+                                   side_effect=partial_dump):
+                with self.assertRaises(RuntimeError):
+                    _dump_stats_atomic(profile, outfile)
+            self.assertEqual(os.listdir(dpath), ['out.prof'])
+            with mock.patch('os.replace', side_effect=PermissionError):
+                with self.assertRaises(PermissionError):
+                    _dump_stats_atomic(profile, outfile)
+            self.assertEqual(os.listdir(dpath), ['out.prof'])
+            pstats.Stats(outfile)
+
+    def test_prepend_sys_path(self):
+        orig_sys_path = sys.path[:]
+        try:
+            _prepend_sys_path('/dummy/dir1')
+            _prepend_sys_path('/dummy/dir1')
+            self.assertEqual(sys.path[:2], ['/dummy/dir1', orig_sys_path[0]])
+            _prepend_sys_path('/dummy/dir2')
+            _prepend_sys_path('/dummy/dir1')
+            self.assertEqual(sys.path[:3],
+                             ['/dummy/dir1', '/dummy/dir2', '/dummy/dir1'])
+        finally:
+            sys.path[:] = orig_sys_path
+
+    def test_repeated_timer(self):
+        outfiles = []
+        timer = RepeatedTimer(0.01, outfiles.append, 'out.lprof')
+        try:
+            deadline = time.time() + 10
+            while len(outfiles) < 3 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            timer.stop()
+        self.assertFalse(timer.is_running)
+        self.assertFalse(timer._thread.is_alive())
+        self.assertGreaterEqual(len(outfiles), 3)
+        self.assertEqual(set(outfiles), {'out.lprof'})
+        num_calls = len(outfiles)
+        time.sleep(0.05)
+        self.assertEqual(len(outfiles), num_calls)
+
+    def test_repeated_timer_survives_failed_dump(self):
+        outfiles = []
+
+        def dump_func(outfile):
+            outfiles.append(outfile)
+            if len(outfiles) == 1:
+                raise PermissionError('outfile is locked')
+
+        with mock.patch('sys.stderr') as stderr:
+            timer = RepeatedTimer(0.01, dump_func, 'out.lprof')
+            try:
+                deadline = time.time() + 10
+                while len(outfiles) < 3 and time.time() < deadline:
+                    time.sleep(0.01)
+            finally:
+                timer.stop()
+        self.assertFalse(timer._thread.is_alive())
+        self.assertGreaterEqual(len(outfiles), 3)
+        message = ''.join(call.args[0] for call in stderr.write.call_args_list)
+        self.assertIn('outfile is locked', message)
+
 if __name__ == '__main__':
     """
     CommandLine: